@@ -1,6 +1,7 @@
+import json
 import gymnasium as gym
 import numpy as np
-from typing import Any, Mapping
+from typing import Any, Mapping, NamedTuple, Tuple
 
 from google.protobuf.struct_pb2 import Struct
 
@@ -147,11 +148,129 @@ def gym_space_to_proto(space):
     else:
         raise ValueError(f"Unsupported Gym space type: {type(space)}")
 
+# === PACKED LAYOUT ===
+class PackedLeaf(NamedTuple):
+    """
+    A fixed-size leaf of a structured space, stored at `offset` in a packed buffer.
+    """
+    path: Tuple
+    dtype: np.dtype
+    shape: Tuple[int, ...]
+    offset: int
+    discrete: bool
+
+    @property
+    def nbytes(self):
+        return self.dtype.itemsize * int(np.prod(self.shape, dtype=np.int64))
+
+class PackedLayout(NamedTuple):
+    """
+    The flattened layout of a Dict/Tuple space: its leaves, a nested skeleton of
+    leaf indices mirroring the space structure, and the total buffer size in bytes.
+    """
+    leaves: Tuple[PackedLeaf, ...]
+    structure: Any
+    size: int
+
+def gym_space_to_packed_layout(space):
+    """
+    Compute the packed layout of a Dict or Tuple space.
+
+    Leaves are laid out depth-first in the order of the space (Dict keys in the order
+    Gymnasium stores them, Tuple items by index), each aligned to its dtype's item size.
+    """
+    if not isinstance(space, (gym.spaces.Dict, gym.spaces.Tuple)):
+        raise ValueError(f"Packed layout requires a Dict or Tuple space, got: {type(space)}")
+    leaves = []
+    structure = _packed_structure(space, (), leaves)
+    size = leaves[-1].offset + leaves[-1].nbytes if leaves else 0
+    return PackedLayout(leaves=tuple(leaves), structure=structure, size=size)
+
+def _packed_structure(space, path, leaves):
+    if isinstance(space, gym.spaces.Dict):
+        return {key: _packed_structure(value, path + (key,), leaves) for key, value in space.spaces.items()}
+    elif isinstance(space, gym.spaces.Tuple):
+        return tuple(_packed_structure(s, path + (i,), leaves) for i, s in enumerate(space.spaces))
+    elif isinstance(space, (gym.spaces.Box, gym.spaces.Discrete, gym.spaces.MultiDiscrete, gym.spaces.MultiBinary)):
+        dtype = np.dtype(space.dtype)
+        offset = leaves[-1].offset + leaves[-1].nbytes if leaves else 0
+        offset = -(-offset // dtype.itemsize) * dtype.itemsize
+        leaves.append(PackedLeaf(
+            path=path,
+            dtype=dtype,
+            shape=tuple(space.shape),
+            offset=offset,
+            discrete=isinstance(space, gym.spaces.Discrete),
+        ))
+        return len(leaves) - 1
+    else:
+        raise ValueError(f"Unsupported Gym space type for packed layout: {type(space)}")
+
+def packed_layout_to_json(layout):
+    """
+    Serialize a packed layout to compact JSON so that clients can slice packed buffers by offset.
+
+    Each leaf is a row [path, dtype, shape, offset, discrete], where discrete is 1 for
+    Discrete leaves (decoded as a scalar int) and 0 otherwise.
+    """
+    return json.dumps(
+        {
+            "size": layout.size,
+            "leaves": [
+                [list(leaf.path), leaf.dtype.name, list(leaf.shape), leaf.offset, int(leaf.discrete)]
+                for leaf in layout.leaves
+            ],
+        },
+        separators=(",", ":"),
+    )
+
+def pack_structured(value, layout):
+    """
+    Pack a structured Dict/Tuple value into a single byte buffer.
+    """
+    buffer = np.zeros(layout.size, dtype=np.uint8)
+    for leaf in layout.leaves:
+        item = value
+        for key in leaf.path:
+            item = item[key]
+        data = np.ascontiguousarray(item, dtype=leaf.dtype).reshape(-1).view(np.uint8)
+        if data.size != leaf.nbytes:
+            raise ValueError(f"Value at {list(leaf.path)} has {data.size} bytes, expected {leaf.nbytes}")
+        buffer[leaf.offset:leaf.offset + leaf.nbytes] = data
+    return buffer.tobytes()
+
+def unpack_structured(data, layout):
+    """
+    Unpack a byte buffer produced by pack_structured into a structured Dict/Tuple value.
+    """
+    if len(data) != layout.size:
+        raise ValueError(f"Packed buffer has {len(data)} bytes, expected {layout.size}")
+    items = []
+    for leaf in layout.leaves:
+        count = int(np.prod(leaf.shape, dtype=np.int64))
+        array = np.frombuffer(data, dtype=leaf.dtype, count=count, offset=leaf.offset).reshape(leaf.shape)
+        items.append(int(array) if leaf.discrete else array)
+    return _unflatten(layout.structure, items)
+
+def _unflatten(structure, items):
+    if isinstance(structure, dict):
+        return {key: _unflatten(value, items) for key, value in structure.items()}
+    elif isinstance(structure, tuple):
+        return tuple(_unflatten(value, items) for value in structure)
+    return items[structure]
+
 # === OBSERVATION MAPPING ===
-def proto_gym_to_observation(obs):
+def proto_gym_to_observation(obs, layout=None):
     """
     Convert Gym observation to Protobuf Observation message.
+
+    If a packed layout is given, the whole observation is encoded as a single uint8
+    NDArray holding the packed buffer.
     """
+    if layout is not None:
+        return Observation(
+            array=NDArray(dtype=DType.uint8, shape=[layout.size], data=pack_structured(obs, layout))
+        )
     if isinstance(obs, np.ndarray):
         return Observation(array=ndarray_to_proto(obs))
     elif isinstance(obs, int):
@@ -176,12 +295,16 @@ def proto_gym_to_observation(obs):
         raise ValueError(f"Unsupported observation type: {type(obs)}")
 
 # === ACTION MAPPING ===
-def proto_to_gym_action(proto):
+def proto_to_gym_action(proto, layout=None):
     """
     Convert Protobuf Action message to Gym action.
+
+    If a packed layout is given, an array action is decoded as a packed buffer.
     """
     field = proto.WhichOneof("value")
-    if field == "array":
+    if field == "array" and layout is not None:
+        return unpack_structured(proto.array.data, layout)
+    elif field == "array":
         return proto_to_ndarray(proto.array)
     elif field == "int32":
         return proto.int32
@@ -0,0 +1,199 @@
+import json
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+
+class ResetCacheEntry(NamedTuple):
+    """
+    A cached seeded reset: the pre-encoded initial observation and, when the
+    environment supports it, a callable that restores the post-reset state.
+    """
+    observation: Any
+    restore: Optional[Callable[[Any], None]]
+    size: int
+
+
+def make_reset_cache_key(env_id, options, render, seed, packed=False):
+    """
+    Build a hashable cache key from the environment id, make options, render flag, seed
+    and observation encoding.
+    """
+    return env_id, json.dumps(options, sort_keys=True, default=str), bool(render), seed, bool(packed)
+
+
+class ResetCache:
+    """
+    A bounded, thread-safe LRU cache of seeded reset results.
+
+    Entries are evicted in least-recently-used order whenever either the entry
+    limit or the memory cap (in bytes) would be exceeded.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=256 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in the cache.
+            max_bytes: Maximum total size in bytes of the cached entries.
+        """
+        if max_entries <= 0:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        if max_bytes <= 0:
+            raise ValueError(f"max_bytes must be positive, got {max_bytes}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable) -> Optional[ResetCacheEntry]:
+        """
+        Look up an entry and mark it as most recently used.
+
+        Returns:
+            The cached entry, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: Hashable, observation, size, restore=None):
+        """
+        Store an entry, evicting least-recently-used entries as needed.
+
+        Entries larger than the memory cap are not stored.
+
+        Returns:
+            True if the entry was stored, False otherwise.
+        """
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            while self._entries and (len(self._entries) >= self.max_entries
+                                     or self._bytes + size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._evictions += 1
+            self._entries[key] = ResetCacheEntry(observation=observation, restore=restore, size=size)
+            self._bytes += size
+            return True
+
+    def clear(self):
+        """
+        Remove all entries. Statistics are preserved.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Return a snapshot of the cache statistics.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+
+# === ENVIRONMENT STATE SNAPSHOTS ===
+# Gymnasium MuJoCo environments whose reset only writes to the physics state and the RNG.
+# Environments keeping per-episode state in Python attributes (e.g. Reacher's goal) are
+# excluded, since a physics snapshot cannot restore it.
+SNAPSHOT_ENV_CLASSES = frozenset(
+    f"gymnasium.envs.mujoco.{module}_{version}.{cls}"
+    for module, cls in (
+        ("ant", "AntEnv"),
+        ("half_cheetah", "HalfCheetahEnv"),
+        ("hopper", "HopperEnv"),
+        ("humanoid", "HumanoidEnv"),
+        ("humanoidstandup", "HumanoidStandupEnv"),
+        ("inverted_double_pendulum", "InvertedDoublePendulumEnv"),
+        ("inverted_pendulum", "InvertedPendulumEnv"),
+        ("swimmer", "SwimmerEnv"),
+        ("walker2d", "Walker2dEnv"),
+    )
+    for version in ("v4", "v5")
+)
+
+
+def snapshot_env_state(env):
+    """
+    Capture the state of a freshly reset environment so that it can later be restored
+    without calling env.reset.
+
+    Only the MuJoCo environments listed in SNAPSHOT_ENV_CLASSES are supported: their
+    integration state is captured together with the environment RNG state, and restoring
+    it reproduces the trajectory of a real seeded reset exactly.
+
+    Returns:
+        A tuple (restore, size) where restore is a callable taking the environment,
+        or (None, 0) if the environment state cannot be captured.
+    """
+    unwrapped = env.unwrapped
+    if f"{type(unwrapped).__module__}.{type(unwrapped).__qualname__}" not in SNAPSHOT_ENV_CLASSES:
+        return None, 0
+
+    model = getattr(unwrapped, "model", None)
+    data = getattr(unwrapped, "data", None)
+    if model is None or data is None:
+        return None, 0
+
+    try:
+        import mujoco
+    except ImportError:
+        return None, 0
+    if not isinstance(model, mujoco.MjModel) or not isinstance(data, mujoco.MjData):
+        return None, 0
+
+    # The warmstart is left out: the mj_forward at the end of reset overwrote it, and restoring it
+    # would start the constraint solver from a different point than a real reset does
+    spec = int(mujoco.mjtState.mjSTATE_INTEGRATION) & ~int(mujoco.mjtState.mjSTATE_WARMSTART)
+    physics = np.empty(mujoco.mj_stateSize(model, spec), dtype=np.float64)
+    mujoco.mj_getState(model, data, physics, spec)
+    rng_state = unwrapped.np_random.bit_generator.state
+    rng_seed = unwrapped.np_random_seed
+
+    def restore(target):
+        # Mirror MujocoEnv.reset: reset the data, set the state, then recompute derived quantities
+        target_unwrapped = target.unwrapped
+        mujoco.mj_resetData(target_unwrapped.model, target_unwrapped.data)
+        mujoco.mj_setState(target_unwrapped.model, target_unwrapped.data, physics, spec)
+        mujoco.mj_forward(target_unwrapped.model, target_unwrapped.data)
+        target_unwrapped.np_random.bit_generator.state = rng_state
+        target_unwrapped._np_random_seed = rng_seed
+        _reset_wrapper_bookkeeping(target)
+
+    return restore, physics.nbytes
+
+
+def _reset_wrapper_bookkeeping(env):
+    """
+    Reset the per-episode counters that the standard gym.make wrappers update in reset.
+    """
+    while env is not env.unwrapped:
+        if hasattr(env, "_elapsed_steps"):
+            env._elapsed_steps = 0
+        if hasattr(env, "_has_reset"):
+            env._has_reset = True
+        env = env.env
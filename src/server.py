@@ -1,5 +1,7 @@
 import grpc
+import threading
 from concurrent import futures
+from contextlib import contextmanager
 import gymnasium as gym
 import numpy as np
 from grpc import StatusCode
@@ -20,24 +22,40 @@ from mapper import (
     gym_space_to_proto,
     proto_gym_to_observation,
     proto_to_gym_action,
-    mapping_to_proto
+    mapping_to_proto,
+    gym_space_to_packed_layout,
+    packed_layout_to_json
 )
+from reset_cache import make_reset_cache_key, snapshot_env_state, ResetCache
 import traceback
 traceback.print_exc()
 
+# Invocation metadata key a client sets on Make to opt in to packed Dict/Tuple encoding
+ENCODING_METADATA_KEY = "observation-encoding"
+PACKED_ENCODING = "packed"
+# Initial metadata key GetSpace uses to send the packed layout of the requested space
+PACKED_LAYOUT_METADATA_KEY = "packed-layout"
+
 class EnvService(EnvServicer):
     """
     Implementation of the Env gRPC service.
     """
 
-    def __init__(self):
+    def __init__(self, reset_cache=None):
         """
         Initialize the EnvService with a dictionary to store environment instances
         and a separate dictionary to track rendering flags.
+
+        Args:
+            reset_cache (optional): A ResetCache used to serve repeated seeded resets.
         """
         super().__init__()
         self.envs = {}  # A dictionary to store environment instances by their handles
         self.render_flags = {}  # A dictionary to track whether rendering is enabled per environment
+        self.env_specs = {}  # A dictionary to track the (env_id, options) each environment was made with
+        self.env_locks = {}  # A dictionary of per-environment locks serializing concurrent calls on one handle
+        self.packed_layouts = {}  # A dictionary of (observation, action) packed layouts for environments using packed encoding
+        self.reset_cache = reset_cache
 
     def Make(self, request, context):
         """
@@ -59,8 +77,15 @@ class EnvService(EnvServicer):
             env_handle = str(id(env_instance))
 
             # Store the environment and render flag
+            self.env_locks[env_handle] = threading.Lock()
             self.envs[env_handle] = env_instance
             self.render_flags[env_handle] = request.render
+            self.env_specs[env_handle] = (env_id, options)
+            if dict(context.invocation_metadata()).get(ENCODING_METADATA_KEY) == PACKED_ENCODING:
+                self.packed_layouts[env_handle] = (
+                    self._packed_layout(env_instance.observation_space),
+                    self._packed_layout(env_instance.action_space),
+                )
 
             metadata_struct = mapping_to_proto(env_instance.metadata)
 
@@ -99,6 +124,11 @@ class EnvService(EnvServicer):
                 context.set_code(StatusCode.UNIMPLEMENTED)
                 return SpaceResponse()
 
+            observation_layout, action_layout = self._get_layouts(request.env_handle)
+            layout = observation_layout if request.space_type == SpaceRequest.OBSERVATION else action_layout
+            if layout is not None:
+                context.send_initial_metadata(((PACKED_LAYOUT_METADATA_KEY, packed_layout_to_json(layout)),))
+
             return SpaceResponse(space=grpc_space)
         except Exception as e:
             self._handle_exception(context, "Unexpected error during get_space", e)
@@ -116,12 +146,15 @@ class EnvService(EnvServicer):
             An Env_pb2.ResetResponse containing the initial observation and optional info.
         """
         try:
-            env_instance = self._get_env_instance(request.env_handle, context)
-            if not env_instance:
-                return ResetResponse()
+            with self._locked_env_instance(request.env_handle, context) as env_instance:
+                if not env_instance:
+                    return ResetResponse()
+
+                if self.reset_cache is not None and request.HasField("seed"):
+                    return self._cached_reset(request.env_handle, env_instance, request.seed)
 
-            observation = env_instance.reset(seed=request.seed if request.HasField("seed") else None)[0]
-            grpc_observation = proto_gym_to_observation(observation)
+                observation = env_instance.reset(seed=request.seed if request.HasField("seed") else None)[0]
+                grpc_observation = proto_gym_to_observation(observation, self._get_layouts(request.env_handle)[0])
 
             return ResetResponse(observation=grpc_observation)
         except Exception as e:
@@ -140,15 +173,16 @@ class EnvService(EnvServicer):
             An Env_pb2.StepResponse containing observation, reward, termination, truncation, and additional info.
         """
         try:
-            env_instance = self._get_env_instance(request.env_handle, context)
-            if not env_instance:
-                return StepResponse()
+            with self._locked_env_instance(request.env_handle, context) as env_instance:
+                if not env_instance:
+                    return StepResponse()
 
-            action = proto_to_gym_action(request.action)
-            observation, reward, terminated, truncated, info = env_instance.step(action)
+                observation_layout, action_layout = self._get_layouts(request.env_handle)
+                action = proto_to_gym_action(request.action, action_layout)
+                observation, reward, terminated, truncated, info = env_instance.step(action)
 
-            grpc_observation = proto_gym_to_observation(observation)
-            grpc_struct = mapping_to_proto(info)
+                grpc_observation = proto_gym_to_observation(observation, observation_layout)
+                grpc_struct = mapping_to_proto(info)
 
             return StepResponse(
                 observation=grpc_observation,
@@ -175,19 +209,16 @@ class EnvService(EnvServicer):
             An Env_pb2.RenderResponse containing the rendered frame (RGB, ANSI, or empty).
         """
         try:
-            # Retrieve the environment instance
-            env_instance = self.envs.get(request.env_handle)
-            if not env_instance:
-                context.set_details("Environment not found.")
-                context.set_code(StatusCode.NOT_FOUND)
-                return RenderResponse()
+            # Retrieve the environment instance and render the frame
+            with self._locked_env_instance(request.env_handle, context) as env_instance:
+                if not env_instance:
+                    return RenderResponse()
 
-            # Check the render flag
-            if not self.render_flags.get(request.env_handle, False):
-                return RenderResponse(empt=Empty())
+                # Check the render flag
+                if not self.render_flags.get(request.env_handle, False):
+                    return RenderResponse(empt=Empty())
 
-            # Render the frame
-            frame = env_instance.render()
+                frame = env_instance.render()
             if isinstance(frame, np.ndarray):
                 return RenderResponse(rgb_array=ndarray_to_proto(frame))
             return RenderResponse(empty=Empty())
@@ -208,19 +239,112 @@ class EnvService(EnvServicer):
             An Env_pb2.Empty response indicating the operation was successful.
         """
         try:
-            env_instance = self._get_env_instance(request.env_handle, context)
-            if not env_instance:
-                return Empty()
-
-            env_instance.close()
-            self.envs.pop(request.env_handle, None)
-            self.render_flags.pop(request.env_handle, None)
+            with self._locked_env_instance(request.env_handle, context) as env_instance:
+                if not env_instance:
+                    return Empty()
+
+                # Remove the handle while holding the lock so that waiting calls see it is gone
+                env_instance.close()
+                self.envs.pop(request.env_handle, None)
+                self.render_flags.pop(request.env_handle, None)
+                self.env_specs.pop(request.env_handle, None)
+                self.env_locks.pop(request.env_handle, None)
+                self.packed_layouts.pop(request.env_handle, None)
 
             return Empty()
         except Exception as e:
             self._handle_exception(context, "Unexpected error during close", e)
             return Empty()
 
+    def _cached_reset(self, env_handle, env_instance, seed):
+        """
+        Resets the environment with a seed, serving the encoded initial observation from
+        the reset cache when possible.
+
+        On a hit the environment state is restored from the cached snapshot if one is
+        available, otherwise the environment is still reset but the observation is not
+        re-encoded.
+
+        Args:
+            env_handle: The unique identifier of the environment.
+            env_instance: The environment instance to reset.
+            seed: The seed to reset the environment with.
+
+        Returns:
+            An Env_pb2.ResetResponse containing the initial observation.
+        """
+        env_id, options = self.env_specs[env_handle]
+        observation_layout = self._get_layouts(env_handle)[0]
+        key = make_reset_cache_key(env_id, options, self.render_flags.get(env_handle, False), seed,
+                                   packed=observation_layout is not None)
+
+        entry = self.reset_cache.get(key)
+        if entry is not None:
+            if entry.restore is not None:
+                entry.restore(env_instance)
+            else:
+                env_instance.reset(seed=seed)
+            return ResetResponse(observation=entry.observation)
+
+        observation = env_instance.reset(seed=seed)[0]
+        grpc_observation = proto_gym_to_observation(observation, observation_layout)
+        restore, state_size = snapshot_env_state(env_instance)
+        self.reset_cache.put(key, grpc_observation, grpc_observation.ByteSize() + state_size, restore)
+
+        return ResetResponse(observation=grpc_observation)
+
+    def _get_layouts(self, env_handle):
+        """
+        Retrieves the packed (observation, action) layouts of an environment.
+
+        Args:
+            env_handle: The unique identifier of the environment.
+
+        Returns:
+            A tuple of packed layouts, where a layout is None if that space uses the regular encoding.
+        """
+        return self.packed_layouts.get(env_handle, (None, None))
+
+    @staticmethod
+    def _packed_layout(space):
+        """
+        Computes the packed layout of a structured space.
+
+        Args:
+            space: The Gym space.
+
+        Returns:
+            The packed layout, or None if the space is not a Dict/Tuple of fixed-size spaces.
+        """
+        if not isinstance(space, (gym.spaces.Dict, gym.spaces.Tuple)):
+            return None
+        try:
+            return gym_space_to_packed_layout(space)
+        except ValueError:
+            return None
+
+    @contextmanager
+    def _locked_env_instance(self, env_handle, context):
+        """
+        Acquires the lock of an environment and yields its instance while the lock is held.
+
+        The handle is checked again once the lock is acquired, since the environment may
+        have been closed while waiting for it.
+
+        Args:
+            env_handle: The unique identifier of the environment.
+            context: The gRPC context to set error details if the handle is invalid.
+
+        Yields:
+            The environment instance if found, None otherwise.
+        """
+        lock = self.env_locks.get(env_handle)
+        if lock is None:
+            yield self._get_env_instance(env_handle, context)
+            return
+        with lock:
+            yield self._get_env_instance(env_handle, context)
+
     def _get_env_instance(self, env_handle, context):
         """
         Retrieves the environment instance corresponding to the given handle.
@@ -261,18 +385,36 @@ def serve():
     import pygame
     pygame.init()
 
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    add_EnvServicer_to_server(EnvService(), server)
+    # The reset cache is opt-in: set RESET_CACHE_ENTRIES to enable it
+    reset_cache = None
+    if os.environ.get("RESET_CACHE_ENTRIES"):
+        reset_cache = ResetCache(
+            max_entries=int(os.environ["RESET_CACHE_ENTRIES"]),
+            max_bytes=int(os.environ.get("RESET_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+        )
+
+    # Each in-flight RPC occupies one worker, so this bounds how many environments can step concurrently
+    max_workers = int(os.environ.get("MAX_WORKERS", 10))
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    add_EnvServicer_to_server(EnvService(reset_cache=reset_cache), server)
 
     # Bind the server to a specific port
     server.add_insecure_port("[::]:50051")
     server.start()
 
+    # docker stop sends SIGTERM: stop the server so that shutdown reporting below still runs
+    import signal
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop(grace=None))
+
     print("Server running on port 50051...")
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
+        pass
+    finally:
         print("Shutting down the server...")
+        if reset_cache is not None:
+            print(f"Reset cache stats: {reset_cache.stats()}", flush=True)
 
 if __name__ == "__main__":
     serve()
@@ -1,3 +1,4 @@
+import json
 import unittest
 import numpy as np
 import gymnasium as gym
@@ -27,6 +28,8 @@ from src.mapper import (
     gym_space_to_proto,
     proto_gym_to_observation,
     proto_to_gym_action,
+    gym_space_to_packed_layout,
+    packed_layout_to_json,
 )
 
 
@@ -200,5 +203,55 @@ class TestMapper(unittest.TestCase):
         self.assertIsInstance(action, dict)
         self.assertEqual(len(action), 0)
 
+    # --- Test Packed Encoding ---
+    def test_gym_dict_space_to_packed_layout(self):
+        space = gym.spaces.Dict({
+            "flag": gym.spaces.MultiBinary(3),
+            "pos": gym.spaces.Box(low=-1.0, high=1.0, shape=(2,), dtype=np.float32),
+            "mode": gym.spaces.Discrete(4),
+        })
+        layout = gym_space_to_packed_layout(space)
+        self.assertEqual([leaf.path for leaf in layout.leaves], [("flag",), ("mode",), ("pos",)])
+        self.assertEqual([leaf.offset for leaf in layout.leaves], [0, 8, 16])
+        self.assertEqual(layout.size, 24)
+        self.assertEqual(json.loads(packed_layout_to_json(layout)), {
+            "size": 24,
+            "leaves": [[["flag"], "int8", [3], 0, 0], [["mode"], "int64", [], 8, 1], [["pos"], "float32", [2], 16, 0]],
+        })
+
+    def test_gym_scalar_space_to_packed_layout_raises(self):
+        with self.assertRaises(ValueError):
+            gym_space_to_packed_layout(gym.spaces.Discrete(n=5))
+
+    def test_gym_dict_to_packed_proto_observation(self):
+        space = gym.spaces.Dict({
+            "pos": gym.spaces.Box(low=-1.0, high=1.0, shape=(2,), dtype=np.float32),
+            "mode": gym.spaces.Discrete(4),
+        })
+        layout = gym_space_to_packed_layout(space)
+        proto = proto_gym_to_observation({"pos": np.array([0.5, -0.5], dtype=np.float32), "mode": 3}, layout)
+        self.assertTrue(proto.HasField("array"))
+        self.assertEqual(proto.array.dtype, DType.uint8)
+        self.assertEqual(proto.array.shape, [layout.size])
+        self.assertEqual(np.frombuffer(proto.array.data, dtype=np.int64, count=1, offset=0)[0], 3)
+        self.assertTrue(np.array_equal(
+            np.frombuffer(proto.array.data, dtype=np.float32, count=2, offset=8),
+            np.array([0.5, -0.5], dtype=np.float32),
+        ))
+
+    def test_proto_packed_to_gym_tuple_action(self):
+        space = gym.spaces.Tuple([
+            gym.spaces.Discrete(3),
+            gym.spaces.Box(low=-1.0, high=1.0, shape=(2,), dtype=np.float32),
+        ])
+        layout = gym_space_to_packed_layout(space)
+        packed = proto_gym_to_observation((2, np.array([1.0, -1.0], dtype=np.float32)), layout)
+        action = proto_to_gym_action(Action(array=packed.array), layout)
+        self.assertIsInstance(action, tuple)
+        self.assertEqual(action[0], 2)
+        self.assertIsInstance(action[0], int)
+        self.assertTrue(np.array_equal(action[1], np.array([1.0, -1.0], dtype=np.float32)))
+        self.assertTrue(space.contains(action))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,150 @@
+import unittest
+from unittest import mock
+
+import gymnasium as gym
+import numpy as np
+
+from src.Env_pb2 import Action, MakeRequest, ResetRequest, StepRequest
+from src.mapper import mapping_to_proto, ndarray_to_proto, proto_to_ndarray
+from src.reset_cache import ResetCache, make_reset_cache_key, snapshot_env_state
+from src.server import EnvService
+from .test_server import FakeContext
+
+
+class TestResetCache(unittest.TestCase):
+    def test_make_reset_cache_key_ignores_option_order(self):
+        key_a = make_reset_cache_key("CartPole-v1", {"a": 1, "b": 2}, False, 42)
+        key_b = make_reset_cache_key("CartPole-v1", {"b": 2, "a": 1}, False, 42)
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, make_reset_cache_key("CartPole-v1", {"a": 1, "b": 2}, False, 43))
+
+    def test_get_returns_stored_entry(self):
+        cache = ResetCache(max_entries=2, max_bytes=100)
+        cache.put("key", "observation", 10)
+        entry = cache.get("key")
+        self.assertEqual(entry.observation, "observation")
+        self.assertIsNone(entry.restore)
+        self.assertEqual(entry.size, 10)
+
+    def test_evicts_least_recently_used_entry(self):
+        cache = ResetCache(max_entries=2, max_bytes=100)
+        cache.put("a", "obs_a", 1)
+        cache.put("b", "obs_b", 1)
+        cache.get("a")
+        cache.put("c", "obs_c", 1)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_respects_memory_cap(self):
+        cache = ResetCache(max_entries=10, max_bytes=100)
+        cache.put("a", "obs_a", 60)
+        cache.put("b", "obs_b", 60)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["bytes"], 60)
+        self.assertFalse(cache.put("c", "obs_c", 101))
+
+    def test_stats_report_hit_rate(self):
+        cache = ResetCache()
+        cache.put("a", "obs_a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("missing")
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+
+
+class TestCachedReset(unittest.TestCase):
+    def _make(self, service, env_id):
+        context = FakeContext()
+        handle = service.Make(MakeRequest(env_id=env_id), context).env_handle
+        self.assertIsNone(context.code)
+        return handle
+
+    def _reset(self, service, handle, seed):
+        context = FakeContext()
+        response = service.Reset(ResetRequest(env_handle=handle, seed=seed), context)
+        self.assertIsNone(context.code)
+        return response
+
+    def _step(self, service, handle, action):
+        context = FakeContext()
+        response = service.Step(StepRequest(env_handle=handle, action=Action(array=ndarray_to_proto(action))), context)
+        self.assertIsNone(context.code)
+        return response
+
+    def _actions(self, env, steps):
+        return np.random.default_rng(0).uniform(
+            env.action_space.low, env.action_space.high, size=(steps,) + env.action_space.shape
+        ).astype(env.action_space.dtype)
+
+    def _assert_trajectory_matches_fresh_env(self, service, handle, env_id, seed, steps=200):
+        fresh = gym.make(env_id)
+        fresh.reset(seed=seed)
+        for action in self._actions(fresh, steps):
+            expected_observation, expected_reward, terminated, truncated, info = fresh.step(action)
+            response = self._step(service, handle, action)
+            np.testing.assert_array_equal(proto_to_ndarray(response.observation.array), expected_observation)
+            self.assertEqual(response.reward, expected_reward)
+            self.assertEqual((response.terminated, response.truncated), (terminated, truncated))
+            self.assertEqual(response.info, mapping_to_proto(info))
+            if terminated or truncated:
+                break
+
+    def _reset_with_hit(self, service, handle, env_id):
+        cache = service.reset_cache
+        first = self._reset(service, handle, seed=1)
+        self._reset(service, handle, seed=2)
+        hit = self._reset(service, handle, seed=1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(hit.observation, first.observation)
+        fresh_observation = gym.make(env_id).reset(seed=1)[0]
+        np.testing.assert_array_equal(proto_to_ndarray(hit.observation.array), fresh_observation)
+
+    def test_mujoco_cache_hit_restores_snapshot(self):
+        # Ant and HumanoidStandup are contact-rich, so a restore that is not bit-exact diverges
+        for env_id in ("HalfCheetah-v5", "Hopper-v5", "Ant-v5", "HumanoidStandup-v5"):
+            with self.subTest(env_id=env_id):
+                service = EnvService(reset_cache=ResetCache())
+                handle = self._make(service, env_id)
+                self._reset(service, handle, seed=1)
+                self._reset(service, handle, seed=2)
+                for action in self._actions(service.envs[handle], 10):
+                    self._step(service, handle, action)
+                env = service.envs[handle]
+                with mock.patch.object(type(env.unwrapped), "reset", side_effect=AssertionError("reset called")):
+                    hit = self._reset(service, handle, seed=1)
+                self.assertEqual(service.reset_cache.stats()["hits"], 1)
+                np.testing.assert_array_equal(proto_to_ndarray(hit.observation.array), gym.make(env_id).reset(seed=1)[0])
+                self._assert_trajectory_matches_fresh_env(service, handle, env_id, seed=1)
+
+    def test_env_with_python_episode_state_is_reset_on_hit(self):
+        env_id = "Reacher-v5"
+        service = EnvService(reset_cache=ResetCache())
+        handle = self._make(service, env_id)
+        self.assertEqual(snapshot_env_state(service.envs[handle]), (None, 0))
+        self._reset_with_hit(service, handle, env_id)
+        fresh = gym.make(env_id)
+        fresh.reset(seed=1)
+        np.testing.assert_array_equal(service.envs[handle].unwrapped.goal, fresh.unwrapped.goal)
+        self._assert_trajectory_matches_fresh_env(service, handle, env_id, seed=1)
+
+    def test_non_mujoco_cache_hit_resets_without_encoding(self):
+        env_id = "CartPole-v1"
+        service = EnvService(reset_cache=ResetCache())
+        handle = self._make(service, env_id)
+        self._reset(service, handle, seed=1)
+        env = service.envs[handle]
+        with mock.patch.object(env, "reset", wraps=env.reset) as reset, \
+                mock.patch("src.server.proto_gym_to_observation") as encode:
+            hit = self._reset(service, handle, seed=1)
+        reset.assert_called_once_with(seed=1)
+        encode.assert_not_called()
+        self.assertEqual(service.reset_cache.stats()["hits"], 1)
+        np.testing.assert_array_equal(proto_to_ndarray(hit.observation.array), gym.make(env_id).reset(seed=1)[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,234 @@
+import json
+import threading
+import time
+import unittest
+from concurrent import futures
+
+import gymnasium as gym
+import numpy as np
+from grpc import StatusCode
+
+from src.Env_pb2 import Action, CloseRequest, MakeRequest, NDArray, DType, ResetRequest, SpaceRequest, StepRequest
+from src.mapper import gym_space_to_packed_layout, pack_structured, proto_to_ndarray
+from src.reset_cache import ResetCache
+from src.server import EnvService
+
+
+class FakeContext:
+    """
+    A minimal stand-in for grpc.ServicerContext.
+    """
+
+    def __init__(self, metadata=()):
+        self.metadata = tuple(metadata)
+        self.initial_metadata = ()
+        self.code = None
+        self.details = None
+
+    def invocation_metadata(self):
+        return self.metadata
+
+    def send_initial_metadata(self, metadata):
+        self.initial_metadata = tuple(metadata)
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+
+class ConcurrencyProbeEnv(gym.Env):
+    """
+    An environment whose step records how many calls run at the same time and, if a
+    barrier is set, waits on it.
+    """
+    observation_space = gym.spaces.Discrete(2)
+    action_space = gym.spaces.Discrete(2)
+    barrier = None
+    step_duration = 0.02
+
+    def __init__(self, render_mode=None):
+        self.render_mode = render_mode
+        self.active = 0
+        self.max_active = 0
+        self.steps = 0
+        self._lock = threading.Lock()
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        return 0, {}
+
+    def step(self, action):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if ConcurrencyProbeEnv.barrier is not None:
+                ConcurrencyProbeEnv.barrier.wait()
+            time.sleep(self.step_duration)
+            self.steps += 1
+            return 0, 0.0, False, False, {}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+gym.register(id="test/ConcurrencyProbe-v0", entry_point=ConcurrencyProbeEnv, disable_env_checker=True)
+
+
+class StructuredEnv(gym.Env):
+    """
+    An environment with a Dict observation space and a Tuple action space that records
+    the last action it received.
+    """
+    observation_space = gym.spaces.Dict({
+        "pos": gym.spaces.Box(low=-1.0, high=1.0, shape=(2,), dtype=np.float32),
+        "mode": gym.spaces.Discrete(4),
+    })
+    action_space = gym.spaces.Tuple([
+        gym.spaces.Discrete(3),
+        gym.spaces.Box(low=-1.0, high=1.0, shape=(2,), dtype=np.float32),
+    ])
+
+    def __init__(self, render_mode=None):
+        self.render_mode = render_mode
+        self.last_action = None
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        return self._observation(), {}
+
+    def step(self, action):
+        self.last_action = action
+        return self._observation(), 1.0, False, False, {}
+
+    def _observation(self):
+        return {
+            "pos": self.np_random.uniform(-1.0, 1.0, size=2).astype(np.float32),
+            "mode": int(self.np_random.integers(4)),
+        }
+
+
+gym.register(id="test/Structured-v0", entry_point=StructuredEnv, disable_env_checker=True)
+
+PACKED = (("observation-encoding", "packed"),)
+
+
+class TestEnvService(unittest.TestCase):
+    def setUp(self):
+        ConcurrencyProbeEnv.barrier = None
+
+    def _make(self, service, env_id, metadata=()):
+        context = FakeContext(metadata)
+        handle = service.Make(MakeRequest(env_id=env_id), context).env_handle
+        self.assertIsNone(context.code)
+        reset_context = FakeContext()
+        service.Reset(ResetRequest(env_handle=handle), reset_context)
+        self.assertIsNone(reset_context.code)
+        return handle
+
+    def _step(self, service, handle, action):
+        context = FakeContext()
+        response = service.Step(StepRequest(env_handle=handle, action=action), context)
+        return response, context
+
+    # --- Test Concurrent Stepping ---
+    def test_concurrent_steps_on_one_handle_do_not_overlap(self):
+        service = EnvService()
+        handle = self._make(service, "test/ConcurrencyProbe-v0")
+        with futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: self._step(service, handle, Action(int32=1)), range(8)))
+        self.assertTrue(all(context.code is None for _, context in results))
+        env = service.envs[handle].unwrapped
+        self.assertEqual(env.steps, 8)
+        self.assertEqual(env.max_active, 1)
+
+    def test_steps_on_different_handles_run_concurrently(self):
+        service = EnvService()
+        handles = [self._make(service, "test/ConcurrencyProbe-v0") for _ in range(4)]
+        # Every step waits until all four are in progress, so this only completes if they overlap
+        ConcurrencyProbeEnv.barrier = threading.Barrier(len(handles), timeout=5)
+        with futures.ThreadPoolExecutor(max_workers=len(handles)) as executor:
+            results = list(executor.map(lambda handle: self._step(service, handle, Action(int32=1)), handles))
+        self.assertTrue(all(context.code is None for _, context in results))
+
+    def test_step_waiting_on_close_returns_not_found(self):
+        service = EnvService()
+        handle = self._make(service, "test/ConcurrencyProbe-v0")
+        env = service.envs[handle].unwrapped
+        with futures.ThreadPoolExecutor(max_workers=1) as executor:
+            # Hold the lock like an in-progress Close, which removes the handle before releasing it
+            with service.env_locks[handle]:
+                step = executor.submit(self._step, service, handle, Action(int32=1))
+                time.sleep(0.05)
+                service.envs.pop(handle)
+            _, context = step.result()
+        self.assertEqual(context.code, StatusCode.NOT_FOUND)
+        self.assertEqual(env.steps, 0)
+
+    def test_step_after_close_returns_not_found(self):
+        service = EnvService()
+        handle = self._make(service, "test/ConcurrencyProbe-v0")
+        service.Close(CloseRequest(env_handle=handle), FakeContext())
+        _, context = self._step(service, handle, Action(int32=1))
+        self.assertEqual(context.code, StatusCode.NOT_FOUND)
+
+    # --- Test Packed Encoding ---
+    def _get_space(self, service, handle, space_type):
+        context = FakeContext()
+        response = service.GetSpace(SpaceRequest(env_handle=handle, space_type=space_type), context)
+        self.assertIsNone(context.code)
+        return response, dict(context.initial_metadata)
+
+    def test_get_space_sends_packed_layout_when_requested_on_make(self):
+        service = EnvService()
+        handle = self._make(service, "test/Structured-v0", PACKED)
+        _, metadata = self._get_space(service, handle, SpaceRequest.OBSERVATION)
+        self.assertEqual(json.loads(metadata["packed-layout"]), {
+            "size": 16,
+            "leaves": [[["mode"], "int64", [], 0, 1], [["pos"], "float32", [2], 8, 0]],
+        })
+        _, metadata = self._get_space(service, handle, SpaceRequest.ACTION)
+        self.assertEqual(json.loads(metadata["packed-layout"])["leaves"][0], [[0], "int64", [], 0, 1])
+
+    def test_get_space_without_opt_in_sends_no_layout(self):
+        service = EnvService()
+        handle = self._make(service, "test/Structured-v0")
+        response, metadata = self._get_space(service, handle, SpaceRequest.OBSERVATION)
+        self.assertTrue(response.space.HasField("dict"))
+        self.assertNotIn("packed-layout", metadata)
+
+    def test_packed_step_decodes_action_and_packs_observation(self):
+        service = EnvService()
+        handle = self._make(service, "test/Structured-v0", PACKED)
+        env = service.envs[handle].unwrapped
+        action_layout = gym_space_to_packed_layout(env.action_space)
+        data = pack_structured((2, np.array([0.5, -0.5], dtype=np.float32)), action_layout)
+        action = Action(array=NDArray(dtype=DType.uint8, shape=[len(data)], data=data))
+
+        response, context = self._step(service, handle, action)
+        self.assertIsNone(context.code)
+        self.assertEqual(env.last_action[0], 2)
+        np.testing.assert_array_equal(env.last_action[1], np.array([0.5, -0.5], dtype=np.float32))
+        self.assertTrue(env.action_space.contains(env.last_action))
+        observation = proto_to_ndarray(response.observation.array)
+        self.assertEqual(observation.dtype, np.uint8)
+        self.assertEqual(observation.shape, (16,))
+
+    def test_packed_and_unpacked_envs_do_not_share_reset_cache_entries(self):
+        service = EnvService(reset_cache=ResetCache())
+        packed = self._make(service, "test/Structured-v0", PACKED)
+        unpacked = self._make(service, "test/Structured-v0")
+        responses = {}
+        for handle in (packed, unpacked, packed, unpacked):
+            context = FakeContext()
+            responses[handle] = service.Reset(ResetRequest(env_handle=handle, seed=7), context)
+            self.assertIsNone(context.code)
+        self.assertTrue(responses[packed].observation.HasField("array"))
+        self.assertTrue(responses[unpacked].observation.HasField("map"))
+        stats = service.reset_cache.stats()
+        self.assertEqual((stats["misses"], stats["hits"]), (2, 2))
+
+if __name__ == "__main__":
+    unittest.main()